@@ -31,6 +31,19 @@ import threading
 import time
 import platform
 import zipfile
+import sqlite3
+import json
+import hashlib
+import statistics
+import heapq
+import glob
+import contextvars
+from array import array
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+try:
+    import resource
+except ImportError:
+    resource = None
 if platform.system() == "Windows":
     os.system("")
 class Colors:
@@ -207,6 +220,129 @@ def ship_zip(src: str, zip_path: str):
         return {"stdout": f"Zipped {file_count} files ({zip_size:.2f} MB)", "stderr": "", "returncode": 0}
     except Exception as e:
         return {"stdout": "", "stderr": str(e), "returncode": -1}
+def _scan_tree(root: str) -> dict:
+    """
+    Map paths relative to root onto (kind, size, mtime_ns, link_target), using
+    os.scandir metadata. kind is "dir", "file" or "link"; symlinks are never followed.
+    """
+    entries = {}
+    pending = [""]
+    while pending:
+        rel_dir = pending.pop()
+        with os.scandir(os.path.join(root, rel_dir)) as it:
+            for entry in it:
+                rel_path = os.path.join(rel_dir, entry.name)
+                if entry.is_symlink():
+                    entries[rel_path] = ("link", 0, 0, os.readlink(entry.path))
+                elif entry.is_dir(follow_symlinks=False):
+                    entries[rel_path] = ("dir", 0, 0, None)
+                    pending.append(rel_path)
+                else:
+                    stat = entry.stat(follow_symlinks=False)
+                    entries[rel_path] = ("file", stat.st_size, stat.st_mtime_ns, None)
+    return entries
+def _sync_entry(src_path: str, dst_path: str, link_target):
+    """Copy one file, or recreate one symlink, from src_path to dst_path."""
+    if link_target is None:
+        shutil.copy2(src_path, dst_path)
+    else:
+        if os.path.lexists(dst_path):
+            os.remove(dst_path)
+        os.symlink(link_target, dst_path)
+    return {"stdout": "", "stderr": "", "returncode": 0}
+def _file_digest(path: str) -> str:
+    """SHA-256 of a file's contents."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+def _remove_path(path: str):
+    """Remove a file or directory tree."""
+    if os.path.isdir(path) and not os.path.islink(path):
+        shutil.rmtree(path)
+    else:
+        os.remove(path)
+@ShipRegistry.register("sync", "Sync Directory")
+def ship_sync(src: str, dst: str, delete_extraneous: bool = False):
+    """
+    Mirror a directory incrementally.
+    Files are compared by size and mtime; contents are hashed only when the
+    sizes match but the mtimes differ. New or changed files are copied in
+    parallel, symlinks are recreated as links rather than followed, and files
+    missing from src are removed when delete_extraneous is set.
+    """
+    try:
+        if not os.path.isdir(src):
+            return {"stdout": "", "stderr": f"Source directory not found: {src}", "returncode": 1}
+        os.makedirs(dst, exist_ok=True)
+        src_entries = _scan_tree(src)
+        dst_entries = _scan_tree(dst)
+        removed = 0
+        removed_dir = None
+        for rel_path in sorted(dst_entries, key=lambda p: p.split(os.sep)):
+            kind = dst_entries[rel_path][0]
+            if removed_dir and rel_path.startswith(removed_dir):
+                removed += kind != "dir"
+                del dst_entries[rel_path]
+                continue
+            wanted = src_entries.get(rel_path)
+            if (wanted is None and delete_extraneous) or (wanted is not None and wanted[0] != kind):
+                _remove_path(os.path.join(dst, rel_path))
+                del dst_entries[rel_path]
+                if kind == "dir":
+                    removed_dir = rel_path + os.sep
+                else:
+                    removed += 1
+        to_copy = []
+        skipped = skipped_bytes = 0
+        for rel_path, (kind, size, mtime_ns, link_target) in sorted(src_entries.items()):
+            if kind == "dir":
+                os.makedirs(os.path.join(dst, rel_path), exist_ok=True)
+                continue
+            current = dst_entries.get(rel_path)
+            if kind == "link":
+                if current is not None and current[3] == link_target:
+                    skipped += 1
+                else:
+                    to_copy.append(rel_path)
+                continue
+            if current is not None and current[1] == size:
+                dst_path = os.path.join(dst, rel_path)
+                if current[2] == mtime_ns:
+                    skipped += 1
+                    skipped_bytes += size
+                    continue
+                if _file_digest(os.path.join(src, rel_path)) == _file_digest(dst_path):
+                    os.utime(dst_path, ns=(os.stat(dst_path).st_atime_ns, mtime_ns))
+                    skipped += 1
+                    skipped_bytes += size
+                    continue
+            to_copy.append(rel_path)
+        entries = [
+            (_sync_entry, {"src_path": os.path.join(src, p), "dst_path": os.path.join(dst, p),
+                           "link_target": src_entries[p][3]})
+            for p in to_copy
+        ]
+        outcomes = {}
+        def collect(i, result, elapsed):
+            outcomes[i] = result
+        _run_parallel(entries, [set() for _ in entries], min(len(entries), BATCH_WORKERS) or 1,
+                      [0.0] * len(entries), collect)
+        for i in sorted(outcomes):
+            if outcomes[i]["returncode"] != 0:
+                return {"stdout": "", "stderr": f"{to_copy[i]}: {outcomes[i]['stderr']}",
+                        "returncode": outcomes[i]["returncode"]}
+        copied_bytes = sum(src_entries[p][1] for p in to_copy)
+        mb = 1024 * 1024
+        return {
+            "stdout": f"Copied {len(to_copy)} files ({copied_bytes / mb:.2f} MB), "
+                      f"skipped {skipped} unchanged ({skipped_bytes / mb:.2f} MB), removed {removed} files",
+            "stderr": "",
+            "returncode": 0
+        }
+    except Exception as e:
+        return {"stdout": "", "stderr": str(e), "returncode": -1}
 @ShipRegistry.register("list", "List Directory")
 def ship_list(path: str):
     """List contents of a directory."""
@@ -236,50 +372,374 @@ def _get_task_name(func, args):
         return f"MkDir: {args.get('path', '')}"
     elif fname == "ship_zip":
         return f"Zip: {os.path.basename(args.get('zip_path', 'unknown'))}"
+    elif fname == "ship_sync":
+        return f"Sync: {os.path.basename(args.get('src', 'unknown'))} → {os.path.basename(args.get('dst', ''))}"
     elif fname == "ship_echo":
         return f"Echo: {args.get('message', '')[:30]}"
+    elif fname == "ship_batch":
+        steps = args.get("steps", [])
+        counts = {}
+        for func, _ in steps:
+            counts[_step_tag(func)] = counts.get(_step_tag(func), 0) + 1
+        summary = ", ".join(f"{count} {tag}" for tag, count in counts.items())
+        return f"Batch: {len(steps)} file ops ({summary})"
+    elif fname == "ship_copy_elided":
+        return f"Copy (elided): {os.path.basename(args.get('src', 'unknown'))}"
+    elif fname == "ship_foreach":
+        return f"Foreach: {args.get('name', '')} over {len(args.get('items', []))} items (parallel {args.get('parallel', 1)})"
     else:
         display = ShipRegistry.get_display_name(fname.replace("ship_", ""))
         return f"{display}: {list(args.values())[0] if args else ''}"[:50]
-def build(task_name: str, tasks, dry_run: bool = False):
-    """Execute a list of build tasks."""
-    results = []
+HISTORY_FILE = ".ship_history.db"
+class ShipHistory:
+    """
+    Persistent record of build runs, stored in a local SQLite file.
+    Step durations are keyed by step identity and feed plan predictions.
+    child_utime/child_stime are per-step deltas; children_peak_rss is the
+    running peak RSS of all child processes so far, not a per-step value.
+    One instance may be shared by builds running on different threads.
+    The connection runs in autocommit mode and step rows are buffered until
+    end_run, so the database is only locked briefly and concurrent builds in
+    the same directory do not block each other. Database errors disable the
+    history with a warning instead of failing the build.
+    """
+    WINDOW = 10
+    def __init__(self, path: str = HISTORY_FILE):
+        self.path = path
+        self.lock = threading.Lock()
+        self.pending = {}
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        try:
+            self.conn.executescript("""
+                CREATE TABLE IF NOT EXISTS runs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    title TEXT, started REAL, duration REAL, returncode INTEGER
+                );
+                CREATE TABLE IF NOT EXISTS steps (
+                    run_id INTEGER, step_key TEXT, tag TEXT, duration REAL, returncode INTEGER,
+                    child_utime REAL, child_stime REAL, children_peak_rss INTEGER
+                );
+                CREATE INDEX IF NOT EXISTS steps_by_key ON steps (step_key);
+            """)
+        except sqlite3.Error:
+            self.conn.close()
+            raise
+    def _disable(self, error):
+        """Warn once and stop using the database after an error."""
+        if self.conn is None:
+            return
+        print(f"{Colors.WARNING}Warning: build history disabled ({self.path}: {error}){Colors.ENDC}")
+        try:
+            self.conn.close()
+        except sqlite3.Error:
+            pass
+        self.conn = None
+    def begin_run(self, title: str):
+        """Open a new run record and return its id, or None if history is unavailable."""
+        with self.lock:
+            if self.conn is None:
+                return None
+            try:
+                cur = self.conn.execute("INSERT INTO runs (title, started) VALUES (?, ?)", (title, time.time()))
+                return cur.lastrowid
+            except sqlite3.Error as e:
+                self._disable(e)
+                return None
+    def record_step(self, run_id: int, key: str, tag: str, duration: float, returncode: int, usage=None):
+        """Buffer the outcome of one step of a run until the run ends."""
+        if run_id is None:
+            return
+        utime, stime, peak_rss = usage if usage else (None, None, None)
+        with self.lock:
+            self.pending.setdefault(run_id, []).append(
+                (run_id, key, tag, duration, returncode, utime, stime, peak_rss)
+            )
+    def end_run(self, run_id: int, duration: float, returncode: int):
+        """Write a run's buffered steps and close its record in one short transaction."""
+        with self.lock:
+            rows = self.pending.pop(run_id, [])
+            if self.conn is None or run_id is None:
+                return
+            try:
+                self.conn.execute("BEGIN")
+                self.conn.executemany("INSERT INTO steps VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+                self.conn.execute("UPDATE runs SET duration = ?, returncode = ? WHERE id = ?", (duration, returncode, run_id))
+                self.conn.execute("COMMIT")
+            except sqlite3.Error as e:
+                if self.conn.in_transaction:
+                    self.conn.execute("ROLLBACK")
+                self._disable(e)
+    def recent_durations(self, key: str, limit: int = WINDOW) -> list:
+        """Durations of the most recent successful runs of a step, newest first."""
+        with self.lock:
+            if self.conn is None:
+                return []
+            try:
+                rows = self.conn.execute(
+                    "SELECT duration FROM steps WHERE step_key = ? AND returncode = 0 ORDER BY rowid DESC LIMIT ?",
+                    (key, limit)
+                ).fetchall()
+            except sqlite3.Error as e:
+                self._disable(e)
+                return []
+        return [row[0] for row in rows]
+    def predict(self, key: str):
+        """Rolling median duration of a step, or None if it has never succeeded."""
+        durations = self.recent_durations(key)
+        return statistics.median(durations) if durations else None
+    def close(self):
+        with self.lock:
+            if self.conn is not None:
+                self.conn.close()
+                self.conn = None
+def open_history(path: str):
+    """Open the build history at path, or warn and return None if it cannot be used."""
+    if not path:
+        return None
+    try:
+        return ShipHistory(path)
+    except sqlite3.Error as e:
+        print(f"{Colors.WARNING}Warning: build history disabled ({path}: {e}){Colors.ENDC}")
+        return None
+def _step_tag(func) -> str:
+    """Registry name of a step function."""
+    return func.__name__.replace("ship_", "")
+def _step_key(func, args) -> str:
+    """Stable identity for a step: its tag plus a digest of its arguments (derived footprints excluded)."""
+    args = {k: v for k, v in args.items() if k != "footprints"}
+    payload = json.dumps(args, sort_keys=True, default=lambda o: getattr(o, "__name__", str(o)))
+    return f"{_step_tag(func)}:{hashlib.sha1(payload.encode('utf-8')).hexdigest()[:16]}"
+def _get_step_paths(func, args):
+    """Return (reads, writes) paths touched by a step, or None if it must run as a barrier."""
+    fname = func.__name__
+    if fname in ("ship_delete", "ship_mkdir"):
+        reads, writes = (), (args.get("path"),)
+    elif fname in ("ship_copy", "ship_copy_elided"):
+        reads, writes = (args.get("src"),), (args.get("dst"),)
+    elif fname in ("ship_move", "ship_move_all"):
+        reads, writes = (), (args.get("src"), args.get("dst"))
+    elif fname == "ship_zip":
+        reads, writes = (args.get("src"),), (args.get("zip_path"),)
+    elif fname == "ship_sync":
+        reads, writes = (args.get("src"),), (args.get("dst"),)
+    elif fname == "ship_list":
+        reads, writes = (args.get("path"),), ()
+    elif fname in ("ship_batch", "ship_foreach"):
+        footprints = args.get("footprints") or [_get_step_paths(f, a) for f, a in _substeps(func, args)]
+        if any(fp is None for fp in footprints):
+            return None
+        return tuple(p for fp in footprints for p in fp[0]), tuple(p for fp in footprints for p in fp[1])
+    else:
+        return None
+    if any(p is None for p in reads + writes):
+        return None
+    norm = lambda p: os.path.normcase(os.path.abspath(str(p)))
+    return tuple(norm(p) for p in reads), tuple(norm(p) for p in writes)
+def _ancestors(path) -> list:
+    """A normalized path followed by each of its parent directories, up to the root."""
+    chain = [path]
+    parent = os.path.dirname(path)
+    while parent != chain[-1]:
+        chain.append(parent)
+        parent = os.path.dirname(parent)
+    return chain
+class _PathIndex:
+    """
+    Step indices keyed by normalized path. overlapping() finds the steps that
+    touched a path equal to, above or below a given one in time proportional
+    to the path depth, instead of comparing against every earlier step.
+    """
+    def __init__(self):
+        self.at = {}
+        self.below = {}
+    def add(self, path, index):
+        chain = _ancestors(path)
+        self.at.setdefault(path, []).append(index)
+        for parent in chain[1:]:
+            self.below.setdefault(parent, []).append(index)
+    def overlapping(self, path) -> list:
+        found = list(self.below.get(path, ()))
+        for p in _ancestors(path):
+            found.extend(self.at.get(p, ()))
+        return found
+def plan_dependencies(tasks, footprints=None) -> list:
+    """
+    For each step, the set of earlier step indices it must wait for.
+    File steps depend on earlier steps touching overlapping paths; anything else
+    (run, echo, unknown tags) is a barrier ordered against every other step.
+    Precomputed footprints (see _get_step_paths) may be passed in.
+    """
+    if footprints is None:
+        footprints = [_get_step_paths(func, args) for func, args in tasks]
+    deps = []
+    last_barrier = -1
+    reads = _PathIndex()
+    writes = _PathIndex()
+    for i, footprint in enumerate(footprints):
+        if footprint is None:
+            step_deps = set(range(max(last_barrier, 0), i))
+            last_barrier = i
+            reads = _PathIndex()
+            writes = _PathIndex()
+        else:
+            step_reads, step_writes = footprint
+            step_deps = {last_barrier} if last_barrier >= 0 else set()
+            for path in step_reads:
+                step_deps.update(writes.overlapping(path))
+            for path in step_writes:
+                step_deps.update(writes.overlapping(path))
+                step_deps.update(reads.overlapping(path))
+            for path in step_reads:
+                reads.add(path, i)
+            for path in step_writes:
+                writes.add(path, i)
+        deps.append(step_deps)
+    return deps
+def critical_path(deps, durations):
+    """Return (indices, total) of the longest duration-weighted chain through the plan."""
+    finish = []
+    parent = []
+    for i, step_deps in enumerate(deps):
+        before = max(step_deps, key=lambda d: finish[d], default=None)
+        parent.append(before)
+        finish.append((finish[before] if before is not None else 0.0) + durations[i])
+    if not finish:
+        return [], 0.0
+    node = max(range(len(finish)), key=lambda i: finish[i])
+    total = finish[node]
+    path = []
+    while node is not None:
+        path.append(node)
+        node = parent[node]
+    return path[::-1], total
+def _child_usage():
+    """Cumulative CPU time and running peak RSS of all finished child processes, if available."""
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return (usage.ru_utime, usage.ru_stime, usage.ru_maxrss)
+def _execute_step(func, args):
+    """Run a single step, returning (result, elapsed)."""
+    start = time.perf_counter()
+    try:
+        result = func(**args)
+    except Exception as e:
+        result = {"stdout": "", "stderr": str(e), "returncode": -1}
+    return result, time.perf_counter() - start
+def _report_step(step_prefix, readable_name, args, result, elapsed):
+    """Print the outcome line (and details) of a finished step."""
+    time_str = f"{elapsed:.2f}s"
+    if result["returncode"] == 0:
+        print(f"{step_prefix} {Symbols.CHECK} {readable_name} {Colors.DIM}({time_str}){Colors.ENDC}")
+        if args.get("verbose", False) and result["stdout"]:
+            print_verbose_block("STDOUT", result["stdout"])
+    else:
+        print(f"{step_prefix} {Symbols.CROSS} {readable_name} {Colors.FAIL}(FAILED in {time_str}){Colors.ENDC}")
+        print(f"\n{Colors.FAIL}>> ERROR DETAILS:{Colors.ENDC}")
+        if result["stdout"]:
+            print(f"{Colors.DIM}{result['stdout']}{Colors.ENDC}")
+        if result["stderr"]:
+            print(f"{Colors.WARNING}{result['stderr']}{Colors.ENDC}")
+def _check_regression(readable_name, elapsed, baseline, threshold):
+    """Warn when a step ran notably slower than its rolling median."""
+    if not baseline or threshold is None:
+        return
+    if elapsed > baseline * (1 + threshold) and elapsed - baseline >= 0.05:
+        print(f"   {Colors.WARNING}⚠ Regression: {readable_name}{Colors.WARNING} took {elapsed:.2f}s "
+              f"vs median {baseline:.2f}s (+{(elapsed / baseline - 1) * 100:.0f}%){Colors.ENDC}")
+def _substeps(func, args) -> list:
+    """Steps folded into a composite step, flattened in script order."""
+    if func.__name__ == "ship_batch":
+        return list(args.get("steps", []))
+    if func.__name__ == "ship_foreach":
+        return [step for steps in args.get("iterations", []) for step in steps]
+    return []
+def _print_substeps(func, args):
+    """List the steps folded into a composite step."""
+    if func.__name__ == "ship_foreach":
+        for item, steps in zip(args.get("items", []), args.get("iterations", [])):
+            print(f"{Colors.DIM}      · {args.get('name')} = {item} ({len(steps)} steps){Colors.ENDC}")
+        return
+    for sub_func, sub_args in _substeps(func, args):
+        print(f"{Colors.DIM}      · {_get_task_name(sub_func, sub_args)}{Colors.ENDC}")
+def explain_plan(task_name: str, tasks, history=None, jobs: int = 1):
+    """Print the plan with predicted durations and its critical path, without executing it."""
+    print_header(f"{task_name} (explain)")
+    deps = plan_dependencies(tasks)
+    predictions = [history.predict(_step_key(func, args)) if history else None for func, args in tasks]
+    path, total = critical_path(deps, [p or 0.0 for p in predictions])
+    on_path = set(path)
+    print(f"{Colors.BOLD}Plan: {len(tasks)} steps, {jobs} job{'s' if jobs != 1 else ''}.{Colors.ENDC}\n")
+    for i, (func, args) in enumerate(tasks):
+        readable_name = _get_task_name(func, args)
+        step_prefix = f"{Colors.DIM}[{i + 1}/{len(tasks)}]{Colors.ENDC}"
+        marker = f"{Colors.WARNING}★{Colors.ENDC}" if i in on_path else " "
+        predicted = f"~{predictions[i]:.2f}s" if predictions[i] is not None else "~?"
+        after = f" after {', '.join(str(d + 1) for d in sorted(deps[i]))}" if deps[i] else ""
+        print(f"{step_prefix} {marker} {readable_name} {Colors.DIM}({predicted}{after}){Colors.ENDC}")
+        _print_substeps(func, args)
+    unknown = sum(1 for p in predictions if p is None)
+    print(f"\n{Colors.DIM}{'-' * 60}{Colors.ENDC}")
+    print(f"Critical path: {len(path)} steps, ~{total:.2f}s predicted (★)")
+    print(f"Sequential total: ~{sum(p or 0.0 for p in predictions):.2f}s")
+    if unknown:
+        print(f"{Colors.DIM}{unknown} step(s) have no history and count as 0s.{Colors.ENDC}")
+    print(f"{Colors.DIM}{'-' * 60}{Colors.ENDC}\n")
+    return []
+def build(task_name: str, tasks, dry_run: bool = False, jobs: int = 1, history=None, regression_threshold: float = 0.5,
+          pool=None):
+    """
+    Execute a list of build tasks.
+    With jobs > 1, independent steps run concurrently, longest predicted first.
+    A shared executor may be passed as pool to run alongside other builds.
+    When a ShipHistory is given, every step is recorded and checked for regressions.
+    """
+    results = {}
     print_header(task_name)
     total_start = time.time()
     print(f"{Colors.BOLD}Plan: {len(tasks)} steps to execute.{Colors.ENDC}\n")
-    for i, (func, args) in enumerate(tasks, start=1):
+    keys = [_step_key(func, args) for func, args in tasks]
+    predictions = [history.predict(key) if history and not dry_run else None for key in keys]
+    run_id = history.begin_run(task_name) if history and not dry_run else None
+    def finish(i, result, elapsed, usage=None):
+        func, args = tasks[i]
         readable_name = _get_task_name(func, args)
-        step_prefix = f"{Colors.DIM}[{i}/{len(tasks)}]{Colors.ENDC}"
-        if dry_run:
-            print(f"{step_prefix} {Symbols.INFO} {readable_name} {Colors.DIM}(Skipped){Colors.ENDC}")
-            results.append({"stdout": "Dry run", "stderr": "", "returncode": 0})
-            continue
-        spinner = Spinner(message=f"{readable_name}...")
-        spinner.start()
-        try:
-            result = func(**args)
-        except Exception as e:
-            result = {"stdout": "", "stderr": str(e), "returncode": -1}
-        elapsed = spinner.stop()
-        time_str = f"{elapsed:.2f}s"
-        if result["returncode"] == 0:
-            print(f"{step_prefix} {Symbols.CHECK} {readable_name} {Colors.DIM}({time_str}){Colors.ENDC}")
-            if args.get("verbose", False) and result["stdout"]:
-                print_verbose_block("STDOUT", result["stdout"])
-        else:
-            print(f"{step_prefix} {Symbols.CROSS} {readable_name} {Colors.FAIL}(FAILED in {time_str}){Colors.ENDC}")
-            print(f"\n{Colors.FAIL}>> ERROR DETAILS:{Colors.ENDC}")
-            if result["stdout"]:
-                print(f"{Colors.DIM}{result['stdout']}{Colors.ENDC}")
-            if result["stderr"]:
-                print(f"{Colors.WARNING}{result['stderr']}{Colors.ENDC}")
-            results.append(result)
-            break
-        results.append(result)
+        _report_step(f"{Colors.DIM}[{i + 1}/{len(tasks)}]{Colors.ENDC}", readable_name, args, result, elapsed)
+        if history:
+            history.record_step(run_id, keys[i], _step_tag(func), elapsed, result["returncode"], usage)
+            if result["returncode"] == 0:
+                _check_regression(readable_name, elapsed, predictions[i], regression_threshold)
+        results[i] = result
+    if dry_run:
+        for i, (func, args) in enumerate(tasks, start=1):
+            readable_name = _get_task_name(func, args)
+            print(f"{Colors.DIM}[{i}/{len(tasks)}]{Colors.ENDC} {Symbols.INFO} {readable_name} {Colors.DIM}(Skipped){Colors.ENDC}")
+            _print_substeps(func, args)
+            results[i - 1] = {"stdout": "Dry run", "stderr": "", "returncode": 0}
+    elif jobs <= 1 and pool is None:
+        for i, (func, args) in enumerate(tasks):
+            spinner = Spinner(message=f"{_get_task_name(func, args)}...")
+            spinner.start()
+            usage_before = _child_usage()
+            result, elapsed = _execute_step(func, args)
+            usage_after = _child_usage()
+            spinner.stop()
+            usage = None
+            if usage_before and usage_after:
+                usage = (usage_after[0] - usage_before[0], usage_after[1] - usage_before[1], usage_after[2])
+            finish(i, result, elapsed, usage)
+            if result["returncode"] != 0:
+                break
+    else:
+        _run_parallel(tasks, plan_dependencies(tasks), jobs, [p or 0.0 for p in predictions], finish, pool=pool)
+    results = [results[i] for i in sorted(results)]
     total_time = time.time() - total_start
     success_count = len([r for r in results if r['returncode'] == 0])
+    succeeded = len(results) == len(tasks) and success_count == len(results)
+    if history and not dry_run:
+        history.end_run(run_id, total_time, 0 if succeeded else 1)
     print(f"\n{Colors.DIM}{'-' * 60}{Colors.ENDC}")
-    if len(results) == len(tasks) and len(results) > 0 and results[-1]['returncode'] == 0:
+    if succeeded and len(results) > 0:
         print(f"{Colors.GREEN}{Colors.BOLD}BUILD SUCCESSFUL{Colors.ENDC}")
     elif len(results) == 0:
         print(f"{Colors.WARNING}{Colors.BOLD}NO TASKS EXECUTED{Colors.ENDC}")
@@ -288,6 +748,248 @@ def build(task_name: str, tasks, dry_run: bool = False):
     print(f"Total Time: {total_time:.2f}s | Steps: {success_count}/{len(tasks)}")
     print(f"{Colors.DIM}{'-' * 60}{Colors.ENDC}\n")
     return results
+_worker_slots = contextvars.ContextVar("ship_worker_slots", default=None)
+_holds_slot = contextvars.ContextVar("ship_holds_slot", default=False)
+def _execute_in_slot(slots, func, args):
+    """Run a step once one of the global worker slots is free, holding it meanwhile."""
+    with slots:
+        _holds_slot.set(True)
+        return _execute_step(func, args)
+def _run_parallel(tasks, deps, jobs, priorities, on_done, pool=None, keep_going=False):
+    """
+    Run steps on a thread pool as their dependencies complete.
+    Ready steps are started longest-priority first; after a failure no new steps
+    start unless keep_going is set. Steps run in a copy of the caller's context,
+    so output labels follow them.
+    When worker slots are set (see run_ship), every running step holds one. A
+    composite step already holds a slot, so its inner work runs one task on it
+    and only starts more while it can borrow free slots.
+    """
+    waiting = {i: set(step_deps) for i, step_deps in enumerate(deps)}
+    dependents = {i: [] for i in range(len(tasks))}
+    for i, step_deps in enumerate(deps):
+        for d in step_deps:
+            dependents[d].append(i)
+    ready = [(-priorities[i], i) for i, step_deps in waiting.items() if not step_deps]
+    heapq.heapify(ready)
+    running = {}
+    failed = False
+    slots = _worker_slots.get()
+    borrowing = slots is not None and _holds_slot.get()
+    borrowed = 0
+    executor = pool or ThreadPoolExecutor(max_workers=jobs)
+    try:
+        while ready or running:
+            if not failed:
+                while ready and len(running) < jobs:
+                    if borrowing and len(running) > borrowed:
+                        if not slots.acquire(blocking=False):
+                            break
+                        borrowed += 1
+                    _, i = heapq.heappop(ready)
+                    func, args = tasks[i]
+                    if slots is not None and not borrowing:
+                        job = (_execute_in_slot, slots, func, args)
+                    else:
+                        job = (_execute_step, func, args)
+                    running[executor.submit(contextvars.copy_context().run, *job)] = i
+            while borrowed and len(running) <= borrowed:
+                slots.release()
+                borrowed -= 1
+            if not running:
+                break
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in sorted(done, key=lambda f: running[f]):
+                i = running.pop(future)
+                result, elapsed = future.result()
+                on_done(i, result, elapsed)
+                if result["returncode"] != 0:
+                    failed = not keep_going
+                    continue
+                for dependent in dependents[i]:
+                    waiting[dependent].discard(i)
+                    if not waiting[dependent]:
+                        heapq.heappush(ready, (-priorities[dependent], dependent))
+    finally:
+        if pool is None:
+            executor.shutdown(wait=True)
+        for _ in range(borrowed):
+            slots.release()
+BATCH_WORKERS = min(32, (os.cpu_count() or 1) + 4)
+FILE_OP_FUNCS = ("ship_mkdir", "ship_copy", "ship_delete")
+def _batch_may_fail(func, args, footprint, written) -> bool:
+    """
+    True if a fused file operation can fail in the normal course of a build:
+    a copy whose source is not already present (or is written earlier in the
+    batch, per the written _PathIndex), or a delete with forgive_missing: false.
+    Checked when the batch runs.
+    """
+    fname = func.__name__
+    if fname == "ship_mkdir":
+        return False
+    if fname == "ship_delete":
+        return not args.get("forgive_missing", True)
+    if fname in ("ship_copy", "ship_copy_elided"):
+        src = footprint[0][0]
+        return not os.path.isfile(src) or bool(written.overlapping(src))
+    return True
+def ship_batch(steps: list, footprints: list = None):
+    """
+    Run fused file operations together on a thread pool.
+    Steps touching overlapping paths keep their order, and every step waits for
+    earlier steps that may fail, so a failure stops the batch where the unfused
+    plan would have stopped.
+    """
+    if footprints is None:
+        footprints = [_get_step_paths(func, args) for func, args in steps]
+    deps = plan_dependencies(steps, footprints)
+    written = _PathIndex()
+    last_fallible = None
+    for i, (func, args) in enumerate(steps):
+        if last_fallible is not None:
+            deps[i].add(last_fallible)
+        if footprints[i] is None:
+            last_fallible = i
+            continue
+        if _batch_may_fail(func, args, footprints[i], written):
+            last_fallible = i
+        for path in footprints[i][1]:
+            written.add(path, i)
+    outcomes = {}
+    def collect(i, result, elapsed):
+        outcomes[i] = result
+    _run_parallel(steps, deps, min(len(steps), BATCH_WORKERS) or 1, [0.0] * len(steps), collect)
+    lines = [outcomes[i]["stdout"] for i in sorted(outcomes) if outcomes[i]["stdout"]]
+    for i in sorted(outcomes):
+        if outcomes[i]["returncode"] != 0:
+            failed_name = _get_task_name(*steps[i])
+            return {
+                "stdout": "\n".join(lines),
+                "stderr": f"{failed_name}: {outcomes[i]['stderr']}",
+                "returncode": outcomes[i]["returncode"]
+            }
+    return {"stdout": "\n".join(lines), "stderr": "", "returncode": 0}
+def ship_copy_elided(src: str, dst: str):
+    """Stand-in for a copy whose destination is deleted before anything reads it."""
+    try:
+        if not os.path.isfile(src):
+            return {"stdout": "", "stderr": f"Source file not found: {src}", "returncode": 1}
+        os.makedirs(os.path.dirname(dst) if os.path.dirname(dst) else ".", exist_ok=True)
+        return {"stdout": f"Skipped copy of {os.path.basename(src)} (destination deleted later)", "stderr": "", "returncode": 0}
+    except Exception as e:
+        return {"stdout": "", "stderr": str(e), "returncode": -1}
+def _run_iteration(steps: list):
+    """Run one foreach iteration, stopping at its first failing step."""
+    for func, args in steps:
+        result, _ = _execute_step(func, args)
+        if result["returncode"] != 0:
+            reason = (result["stderr"] or result["stdout"] or f"exit code {result['returncode']}").splitlines()[0]
+            return {"stdout": "", "stderr": f"{_get_task_name(func, args)}: {reason}", "returncode": result["returncode"]}
+    return {"stdout": "", "stderr": "", "returncode": 0}
+def ship_foreach(name: str, items: list, iterations: list, parallel: int = 1):
+    """
+    Run the instantiated bodies of a foreach loop, up to parallel at a time.
+    Each iteration stops at its first failing step; every iteration still runs,
+    and failures are summarized per item.
+    """
+    outcomes = {}
+    def collect(i, result, elapsed):
+        outcomes[i] = result
+    tasks = [(_run_iteration, {"steps": steps}) for steps in iterations]
+    _run_parallel(tasks, [set() for _ in tasks], max(1, min(parallel, len(tasks))), [0.0] * len(tasks), collect,
+                  keep_going=True)
+    failures = [
+        f"{name} = {item}: {outcomes[i]['stderr']}"
+        for i, item in enumerate(items) if outcomes[i]["returncode"] != 0
+    ]
+    summary = f"{len(items) - len(failures)}/{len(items)} iterations succeeded"
+    if failures:
+        return {"stdout": summary, "stderr": "\n".join(failures), "returncode": 1}
+    return {"stdout": summary, "stderr": "", "returncode": 0}
+def _is_within(path, ancestor) -> bool:
+    """True if a normalized path equals or lies under another."""
+    return path == ancestor or path.startswith(ancestor.rstrip(os.sep) + os.sep)
+def _simplify_file_ops(steps, footprints):
+    """
+    Drop file operations that cannot change the outcome of a fused run:
+    mkdirs already covered by another mkdir of the same or a deeper path, and
+    copies whose destination is deleted later without being read (these keep
+    their source check so failures still surface). Returns the surviving steps
+    and their footprints.
+    """
+    steps = list(steps)
+    will_create = set()
+    for i in reversed(range(len(steps))):
+        if steps[i][0].__name__ != "ship_mkdir":
+            will_create = set()
+            continue
+        path = footprints[i][1][0]
+        if path in will_create:
+            steps[i] = None
+        else:
+            will_create.update(_ancestors(path))
+    created = set()
+    for i, step in enumerate(steps):
+        if step is None:
+            continue
+        if step[0].__name__ == "ship_delete":
+            created = set()
+        elif step[0].__name__ == "ship_mkdir":
+            path = footprints[i][1][0]
+            if path in created:
+                steps[i] = None
+            else:
+                created.update(_ancestors(path))
+    nearest_at = {}
+    nearest_below = {}
+    for i in reversed(range(len(steps))):
+        if steps[i] is None:
+            continue
+        func, args = steps[i]
+        if func.__name__ == "ship_copy":
+            dst = footprints[i][1][0]
+            candidates = [nearest_below.get(dst)] + [nearest_at.get(p) for p in _ancestors(dst)]
+            k = min((c for c in candidates if c is not None), default=None)
+            if (
+                k is not None
+                and steps[k][0].__name__ == "ship_delete"
+                and steps[k][1].get("forgive_missing", True)
+                and _is_within(dst, footprints[k][1][0])
+            ):
+                steps[i] = (ship_copy_elided, args)
+        for path in footprints[i][0] + footprints[i][1]:
+            nearest_at[path] = i
+            for parent in _ancestors(path)[1:]:
+                nearest_below[parent] = i
+    kept = [i for i, step in enumerate(steps) if step is not None]
+    return [steps[i] for i in kept], [footprints[i] for i in kept]
+def optimize_plan(tasks) -> list:
+    """
+    Fuse each run of adjacent mkdir/copy/delete steps into one batched step.
+    Other steps are left untouched and keep their position in the plan.
+    Footprints are computed once here and carried in the batch arguments.
+    """
+    optimized = []
+    group = []
+    group_footprints = []
+    def flush():
+        steps, footprints = _simplify_file_ops(group, group_footprints)
+        if len(steps) > 1:
+            optimized.append((ship_batch, {"steps": steps, "footprints": footprints}))
+        else:
+            optimized.extend(steps)
+        group.clear()
+        group_footprints.clear()
+    for func, args in tasks:
+        footprint = _get_step_paths(func, args) if func.__name__ in FILE_OP_FUNCS else None
+        if footprint is not None:
+            group.append((func, args))
+            group_footprints.append(footprint)
+        else:
+            flush()
+            optimized.append((func, args))
+    flush()
+    return optimized
 class ShipToken:
     """Token types for Ship DSL lexer."""
     LBRACE = 'LBRACE'
@@ -313,6 +1015,47 @@ class ShipToken:
     BOOL = 'BOOL'
     NULL = 'NULL'
     EOF = 'EOF'
+    KINDS = (
+        LBRACE, RBRACE, LPAREN, RPAREN, COLON, COMMA, EQUALS, EQ, NE, LT, LE, GT, GE,
+        AND, OR, NOT, IDENT, CUSTOM, STRING, NUMBER, BOOL, NULL, EOF
+    )
+    CODES = {kind: code for code, kind in enumerate(KINDS)}
+class ShipTokens:
+    """
+    Compact token stream produced by ShipLexer.
+    Kinds and lines are kept in typed arrays rather than per-token tuples, and
+    match[i] holds the index of the brace paired with brace i (the EOF token
+    for an unclosed '{', -1 for everything else), so a block can be skipped
+    with a single lookup.
+    """
+    def __init__(self):
+        self.kinds = array('B')
+        self.lines = array('I')
+        self.match = array('i')
+        self.values = []
+        self._open = []
+    def append(self, kind, value, line):
+        index = len(self.kinds)
+        self.kinds.append(ShipToken.CODES[kind])
+        self.lines.append(line)
+        self.match.append(-1)
+        self.values.append(value)
+        if kind == ShipToken.LBRACE:
+            self._open.append(index)
+        elif kind == ShipToken.RBRACE and self._open:
+            opening = self._open.pop()
+            self.match[opening] = index
+            self.match[index] = opening
+        elif kind == ShipToken.EOF:
+            for opening in self._open:
+                self.match[opening] = index
+            self._open.clear()
+    def kind(self, index):
+        return ShipToken.KINDS[self.kinds[index]]
+    def __len__(self):
+        return len(self.kinds)
+    def __getitem__(self, index):
+        return (ShipToken.KINDS[self.kinds[index]], self.values[index], self.lines[index])
 class ShipLexer:
     """Tokenizer for Ship DSL."""
     def __init__(self, text):
@@ -398,7 +1141,7 @@ class ShipLexer:
         num_str = ''.join(result)
         return float(num_str) if has_dot else int(num_str)
     def tokenize(self):
-        tokens = []
+        tokens = ShipTokens()
         while self.pos < len(self.text):
             self._skip_whitespace_and_comments()
             if self.pos >= len(self.text):
@@ -406,85 +1149,105 @@ class ShipLexer:
             c = self._peek()
             line = self.line
             if c == '=' and self._peek(1) == '=':
-                tokens.append((ShipToken.EQ, '==', line))
+                tokens.append(ShipToken.EQ, '==', line)
                 self._advance()
                 self._advance()
             elif c == '!' and self._peek(1) == '=':
-                tokens.append((ShipToken.NE, '!=', line))
+                tokens.append(ShipToken.NE, '!=', line)
                 self._advance()
                 self._advance()
             elif c == '<' and self._peek(1) == '=':
-                tokens.append((ShipToken.LE, '<=', line))
+                tokens.append(ShipToken.LE, '<=', line)
                 self._advance()
                 self._advance()
             elif c == '>' and self._peek(1) == '=':
-                tokens.append((ShipToken.GE, '>=', line))
+                tokens.append(ShipToken.GE, '>=', line)
                 self._advance()
                 self._advance()
             elif c == '&' and self._peek(1) == '&':
-                tokens.append((ShipToken.AND, '&&', line))
+                tokens.append(ShipToken.AND, '&&', line)
                 self._advance()
                 self._advance()
             elif c == '|' and self._peek(1) == '|':
-                tokens.append((ShipToken.OR, '||', line))
+                tokens.append(ShipToken.OR, '||', line)
                 self._advance()
                 self._advance()
             elif c == '{':
-                tokens.append((ShipToken.LBRACE, '{', line))
+                tokens.append(ShipToken.LBRACE, '{', line)
                 self._advance()
             elif c == '}':
-                tokens.append((ShipToken.RBRACE, '}', line))
+                tokens.append(ShipToken.RBRACE, '}', line)
                 self._advance()
             elif c == '(':
-                tokens.append((ShipToken.LPAREN, '(', line))
+                tokens.append(ShipToken.LPAREN, '(', line)
                 self._advance()
             elif c == ')':
-                tokens.append((ShipToken.RPAREN, ')', line))
+                tokens.append(ShipToken.RPAREN, ')', line)
                 self._advance()
             elif c == ':':
-                tokens.append((ShipToken.COLON, ':', line))
+                tokens.append(ShipToken.COLON, ':', line)
                 self._advance()
             elif c == ',':
-                tokens.append((ShipToken.COMMA, ',', line))
+                tokens.append(ShipToken.COMMA, ',', line)
                 self._advance()
             elif c == '=':
-                tokens.append((ShipToken.EQUALS, '=', line))
+                tokens.append(ShipToken.EQUALS, '=', line)
                 self._advance()
             elif c == '<':
-                tokens.append((ShipToken.LT, '<', line))
+                tokens.append(ShipToken.LT, '<', line)
                 self._advance()
             elif c == '>':
-                tokens.append((ShipToken.GT, '>', line))
+                tokens.append(ShipToken.GT, '>', line)
                 self._advance()
             elif c == '!':
-                tokens.append((ShipToken.NOT, '!', line))
+                tokens.append(ShipToken.NOT, '!', line)
                 self._advance()
             elif c == '"' or c == "'":
                 s = self._read_string(c)
-                tokens.append((ShipToken.STRING, s, line))
+                tokens.append(ShipToken.STRING, s, line)
             elif c == '$':
                 self._advance()
                 name = self._read_identifier()
-                tokens.append((ShipToken.CUSTOM, name, line))
+                tokens.append(ShipToken.CUSTOM, name, line)
             elif c.isdigit() or (c == '-' and self._peek(1).isdigit()):
                 if c == '-':
                     self._advance()
                     num = -self._read_number()
                 else:
                     num = self._read_number()
-                tokens.append((ShipToken.NUMBER, num, line))
+                tokens.append(ShipToken.NUMBER, num, line)
             elif c.isalpha() or c == '_':
                 ident = self._read_identifier()
                 if ident.lower() in ('true', 'false'):
-                    tokens.append((ShipToken.BOOL, ident.lower() == 'true', line))
+                    tokens.append(ShipToken.BOOL, ident.lower() == 'true', line)
                 elif ident.lower() in ('null', 'none'):
-                    tokens.append((ShipToken.NULL, None, line))
+                    tokens.append(ShipToken.NULL, None, line)
                 else:
-                    tokens.append((ShipToken.IDENT, ident, line))
+                    tokens.append(ShipToken.IDENT, ident, line)
             else:
                 self._advance()
-        tokens.append((ShipToken.EOF, None, self.line))
+        tokens.append(ShipToken.EOF, None, self.line)
         return tokens
+class _LoopItem:
+    """Placeholder for a foreach variable while its body is parsed once."""
+    def __init__(self, name):
+        self.name = name
+class _LoopItemUsed(Exception):
+    """Raised when a foreach body needs the actual loop value to parse."""
+    def __init__(self, name):
+        super().__init__(name)
+        self.name = name
+def _bind_loop_item(value, placeholder, item):
+    """Copy a parsed structure, replacing a loop placeholder with an item."""
+    if value is placeholder:
+        return item
+    if isinstance(value, dict):
+        return {key: _bind_loop_item(v, placeholder, item) for key, v in value.items()}
+    if isinstance(value, list):
+        return [_bind_loop_item(v, placeholder, item) for v in value]
+    if isinstance(value, tuple):
+        return tuple(_bind_loop_item(v, placeholder, item) for v in value)
+    return value
 class ShipParser:
     """
     Parser for Ship DSL.
@@ -498,10 +1261,12 @@ class ShipParser:
         self.variables = variables or {}
         self.tasks = []
         self.title = "Ship Build"
-        self.tokens = []
+        self.tokens = ShipTokens()
         self.pos = 0
     def _current(self):
         return self.tokens[self.pos] if self.pos < len(self.tokens) else (ShipToken.EOF, None, 0)
+    def _kind(self):
+        return self.tokens.kind(self.pos) if self.pos < len(self.tokens) else ShipToken.EOF
     def _peek(self, offset=0):
         idx = self.pos + offset
         return self.tokens[idx] if idx < len(self.tokens) else (ShipToken.EOF, None, 0)
@@ -549,6 +1314,8 @@ class ShipParser:
             raise SyntaxError(f"Unexpected token {tok[0]} '{tok[1]}' at line {tok[2]}")
     def _to_bool(self, value):
         """Convert a value to boolean."""
+        if isinstance(value, _LoopItem):
+            raise _LoopItemUsed(value.name)
         if isinstance(value, bool):
             return value
         if isinstance(value, str):
@@ -564,6 +1331,8 @@ class ShipParser:
             op = tok[0]
             self._advance()
             right = self._parse_primary()
+            if isinstance(left, _LoopItem) or isinstance(right, _LoopItem):
+                raise _LoopItemUsed((left if isinstance(left, _LoopItem) else right).name)
             if op == ShipToken.EQ:
                 return left == right
             elif op == ShipToken.NE:
@@ -580,7 +1349,7 @@ class ShipParser:
     def _parse_and(self):
         """Parse && expressions."""
         left = self._parse_comparison()
-        while self._current()[0] == ShipToken.AND:
+        while self._kind() == ShipToken.AND:
             self._advance()
             right = self._parse_comparison()
             left = self._to_bool(left) and self._to_bool(right)
@@ -588,7 +1357,7 @@ class ShipParser:
     def _parse_expression(self):
         """Parse full expression with || (lowest precedence)."""
         left = self._parse_and()
-        while self._current()[0] == ShipToken.OR:
+        while self._kind() == ShipToken.OR:
             self._advance()
             right = self._parse_and()
             left = self._to_bool(left) or self._to_bool(right)
@@ -600,20 +1369,20 @@ class ShipParser:
         """Parse function arguments { key: value, key: value }."""
         args = {}
         self._expect(ShipToken.LBRACE)
-        while self._current()[0] != ShipToken.RBRACE:
-            if self._current()[0] == ShipToken.EOF:
+        while self._kind() != ShipToken.RBRACE:
+            if self._kind() == ShipToken.EOF:
                 raise SyntaxError("Unexpected end of file in function arguments")
             key_tok = self._current()
             if key_tok[0] not in (ShipToken.IDENT, ShipToken.STRING):
                 raise SyntaxError(f"Expected argument name at line {key_tok[2]}, got {key_tok[0]}")
             key = key_tok[1]
             self._advance()
-            if self._current()[0] != ShipToken.COLON:
+            if self._kind() != ShipToken.COLON:
                 raise SyntaxError(f"Expected ':' after argument name at line {self._current()[2]}. Use ':' for function arguments, '=' is only for var blocks.")
             self._advance()
             value = self._parse_value()
             args[key] = value
-            if self._current()[0] == ShipToken.COMMA:
+            if self._kind() == ShipToken.COMMA:
                 self._advance()
         self._expect(ShipToken.RBRACE)
         return args
@@ -621,21 +1390,21 @@ class ShipParser:
         """Parse var { KEY = value } block."""
         self._expect(ShipToken.LBRACE)
         script_vars = {}
-        while self._current()[0] != ShipToken.RBRACE:
-            if self._current()[0] == ShipToken.EOF:
+        while self._kind() != ShipToken.RBRACE:
+            if self._kind() == ShipToken.EOF:
                 raise SyntaxError("Unexpected end of file in var block")
             name_tok = self._current()
             if name_tok[0] != ShipToken.IDENT:
                 raise SyntaxError(f"Expected variable name at line {name_tok[2]}")
             name = name_tok[1]
             self._advance()
-            if self._current()[0] != ShipToken.EQUALS:
+            if self._kind() != ShipToken.EQUALS:
                 raise SyntaxError(f"Expected '=' after variable name at line {self._current()[2]}. Use '=' for var blocks.")
             self._advance()
             value = self._parse_value()
             if name not in self.variables:
                 script_vars[name] = value
-            if self._current()[0] == ShipToken.COMMA:
+            if self._kind() == ShipToken.COMMA:
                 self._advance()
         self._expect(ShipToken.RBRACE)
         self.variables = {**script_vars, **self.variables}
@@ -643,84 +1412,160 @@ class ShipParser:
         """Parse if/elif/else chain."""
         condition = self._parse_expression()
         condition_met = self._to_bool(condition)
+        open_index = self.pos
         self._expect(ShipToken.LBRACE)
         if_tasks = []
         if condition_met:
             if_tasks = self._parse_block_body()
         else:
-            self._skip_block_body()
+            self._skip_block_body(open_index)
         self._expect(ShipToken.RBRACE)
         result_tasks = if_tasks if condition_met else []
         already_matched = condition_met
-        while self._current()[0] == ShipToken.IDENT:
+        while self._kind() == ShipToken.IDENT:
             tok = self._current()
             if tok[1] == 'elif':
                 self._advance()
                 elif_condition = self._parse_expression()
                 elif_met = self._to_bool(elif_condition) and not already_matched
+                open_index = self.pos
                 self._expect(ShipToken.LBRACE)
                 if elif_met:
                     result_tasks = self._parse_block_body()
                     already_matched = True
                 else:
-                    self._skip_block_body()
+                    self._skip_block_body(open_index)
                 self._expect(ShipToken.RBRACE)
             elif tok[1] == 'else':
                 self._advance()
+                open_index = self.pos
                 self._expect(ShipToken.LBRACE)
                 if not already_matched:
                     result_tasks = self._parse_block_body()
                 else:
-                    self._skip_block_body()
+                    self._skip_block_body(open_index)
                 self._expect(ShipToken.RBRACE)
                 break
             else:
                 break
         return result_tasks
-    def _skip_block_body(self):
-        """Skip contents of a block."""
-        depth = 1
-        while depth > 0 and self._current()[0] != ShipToken.EOF:
-            tok = self._current()
-            if tok[0] == ShipToken.LBRACE:
-                depth += 1
-            elif tok[0] == ShipToken.RBRACE:
-                depth -= 1
-                if depth == 0:
-                    return
+    def _expand_items(self, source):
+        """
+        Expand a foreach source: a glob pattern, or a comma-separated list.
+        Globs are matched while parsing, against the tree as it is before any
+        step runs, so files produced by earlier steps of the build are not seen.
+        """
+        if isinstance(source, _LoopItem):
+            raise _LoopItemUsed(source.name)
+        if source is None:
+            return []
+        if isinstance(source, (list, tuple)):
+            return list(source)
+        text = str(source)
+        if any(c in text for c in '*?['):
+            return sorted(glob.glob(text, recursive=True))
+        return [item.strip() for item in text.split(',') if item.strip()]
+    def _parse_foreach(self):
+        """
+        Parse foreach NAME in LIST_OR_GLOB { [parallel: N] body }.
+        The body is parsed once with NAME bound to a placeholder and instantiated
+        per item; bodies that branch on NAME are re-parsed for each item instead.
+        Variables declared in the body do not outlive the loop.
+        """
+        name_tok = self._current()
+        if name_tok[0] != ShipToken.IDENT:
+            raise SyntaxError(f"Expected loop variable after 'foreach' at line {name_tok[2]}")
+        name = name_tok[1]
+        self._advance()
+        in_tok = self._current()
+        if in_tok[0] != ShipToken.IDENT or in_tok[1] != 'in':
+            raise SyntaxError(f"Expected 'in' after foreach variable at line {in_tok[2]}")
+        self._advance()
+        items = self._expand_items(self._parse_value())
+        open_index = self.pos
+        self._expect(ShipToken.LBRACE)
+        parallel = 1
+        if self._kind() == ShipToken.IDENT and self._current()[1] == 'parallel' and self._peek(1)[0] == ShipToken.COLON:
+            line = self._current()[2]
+            self._advance()
             self._advance()
+            value = self._parse_value()
+            if isinstance(value, _LoopItem):
+                raise _LoopItemUsed(value.name)
+            try:
+                parallel = max(1, int(value))
+            except (TypeError, ValueError):
+                raise SyntaxError(f"Expected a number for 'parallel' at line {line}")
+        if not items:
+            self._skip_block_body(open_index)
+            self._expect(ShipToken.RBRACE)
+            return []
+        body_start = self.pos
+        saved_variables = self.variables
+        placeholder = _LoopItem(name)
+        try:
+            self.variables = {**saved_variables, name: placeholder}
+            template = self._parse_block_body()
+            iterations = [_bind_loop_item(template, placeholder, item) for item in items]
+        except _LoopItemUsed as e:
+            if e.name != name:
+                raise
+            iterations = []
+            for item in items:
+                self.pos = body_start
+                self.variables = {**saved_variables, name: item}
+                iterations.append(self._parse_block_body())
+        finally:
+            self.variables = saved_variables
+        self._expect(ShipToken.RBRACE)
+        if parallel > 1:
+            return [(ship_foreach, {"name": name, "items": items, "iterations": iterations, "parallel": parallel})]
+        return [step for steps in iterations for step in steps]
+    def _skip_block_body(self, open_index):
+        """Skip contents of a block, jumping from its '{' at open_index straight to the matching '}'."""
+        if open_index < 0 or open_index >= len(self.tokens) or self.tokens.kind(open_index) != ShipToken.LBRACE:
+            raise SyntaxError(f"Internal error: block skip did not start at '{{' (token {open_index})")
+        close_index = self.tokens.match[open_index]
+        if close_index < 0:
+            raise SyntaxError(f"Unmatched '{{' at line {self.tokens.lines[open_index]}")
+        self.pos = close_index
     def _parse_block_body(self):
         """Parse the body of a block."""
         tasks = []
-        while self._current()[0] not in (ShipToken.RBRACE, ShipToken.EOF):
+        while self._kind() not in (ShipToken.RBRACE, ShipToken.EOF):
             tok = self._current()
             if tok[0] == ShipToken.IDENT:
                 ident = tok[1]
                 self._advance()
                 if ident == 'title':
-                    if self._current()[0] == ShipToken.COLON:
+                    if self._kind() == ShipToken.COLON:
                         self._advance()
-                    self.title = str(self._parse_value())
+                    title = self._parse_value()
+                    if isinstance(title, _LoopItem):
+                        raise _LoopItemUsed(title.name)
+                    self.title = str(title)
                 elif ident == 'var':
                     self._parse_var_block()
                 elif ident == 'if':
                     if_tasks = self._parse_if_block()
                     tasks.extend(if_tasks)
+                elif ident == 'foreach':
+                    tasks.extend(self._parse_foreach())
                 elif ShipRegistry.exists(ident):
                     func = ShipRegistry.get(ident)
                     args = self._parse_function_args()
                     tasks.append((func, args))
                 else:
-                    if self._current()[0] == ShipToken.LBRACE:
+                    if self._kind() == ShipToken.LBRACE:
                         self._advance()
-                        self._skip_block_body()
+                        self._skip_block_body(self.pos - 1)
                         self._expect(ShipToken.RBRACE)
             elif tok[0] == ShipToken.CUSTOM:
                 custom_name = tok[1]
                 self._advance()
-                if self._current()[0] == ShipToken.LBRACE:
+                if self._kind() == ShipToken.LBRACE:
                     self._advance()
-                    self._skip_block_body()
+                    self._skip_block_body(self.pos - 1)
                     self._expect(ShipToken.RBRACE)
                 print(f"{Colors.DIM}Custom task: ${custom_name}{Colors.ENDC}")
             else:
@@ -740,16 +1585,163 @@ class ShipParser:
         else:
             self.tasks = self._parse_block_body()
         return self
-    def execute(self, dry_run=False):
+    def execute(self, dry_run=False, jobs=1, history=None, explain=False, regression_threshold=0.5, optimize=True,
+                pool=None):
         """Execute the parsed Ship script."""
-        return build(self.title, self.tasks, dry_run=dry_run)
-def run_ship(script_path: str, dry_run: bool = False):
-    """Load and execute a Ship DSL script from a file."""
+        tasks = optimize_plan(self.tasks) if optimize else self.tasks
+        if explain:
+            return explain_plan(self.title, tasks, history=history, jobs=jobs)
+        return build(self.title, tasks, dry_run=dry_run, jobs=jobs, history=history,
+                     regression_threshold=regression_threshold, pool=pool)
+def load_ship(script_path: str):
+    """Read and parse a Ship DSL script, returning its ShipParser."""
     with open(script_path, 'r', encoding='utf-8') as f:
         script_content = f.read()
     parser = ShipParser()
     parser.parse(script_content)
-    return parser.execute(dry_run=dry_run)
+    return parser
+def run_ship(script_path: str, dry_run: bool = False, jobs: int = None, explain: bool = False,
+             history_path: str = HISTORY_FILE, regression_threshold: float = 0.5, optimize: bool = True):
+    """
+    Load and execute a Ship DSL script from a file.
+    When jobs is given it limits all concurrent work, including the work inside
+    batch, sync and parallel foreach steps. Otherwise steps run one at a time.
+    Runs are recorded in the SQLite file at history_path; pass None to disable.
+    """
+    parser = load_ship(script_path)
+    history = open_history(history_path) if explain or not dry_run else None
+    token = _worker_slots.set(threading.BoundedSemaphore(jobs)) if jobs else None
+    try:
+        return parser.execute(dry_run=dry_run, jobs=jobs or 1, history=history, explain=explain,
+                              regression_threshold=regression_threshold, optimize=optimize)
+    finally:
+        if token:
+            _worker_slots.reset(token)
+        if history:
+            history.close()
+_output_label = contextvars.ContextVar("ship_output_label", default=None)
+class PrefixedOutput:
+    """
+    Stdout proxy that prefixes every line with the label of the script writing it.
+    Partial lines are buffered per label and thread until their newline arrives.
+    """
+    def __init__(self, stream):
+        self.stream = stream
+        self.lock = threading.Lock()
+        self.pending = {}
+    def write(self, text):
+        label = _output_label.get()
+        with self.lock:
+            if label is None:
+                self.stream.write(text)
+                return len(text)
+            key = (label, threading.get_ident())
+            *lines, rest = (self.pending.pop(key, "") + text).split("\n")
+            for line in lines:
+                self.stream.write(f"{label}{line}\n")
+            if rest:
+                self.pending[key] = rest
+        return len(text)
+    def flush(self):
+        with self.lock:
+            self.stream.flush()
+    def drain(self):
+        """Write out any buffered partial lines."""
+        with self.lock:
+            for (label, _), rest in self.pending.items():
+                self.stream.write(f"{label}{rest}\n")
+            self.pending.clear()
+            self.stream.flush()
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+def run_ships(script_paths, dry_run: bool = False, jobs: int = None, explain: bool = False,
+              history_path: str = HISTORY_FILE, regression_threshold: float = 0.5, optimize: bool = True):
+    """
+    Parse and execute several Ship DSL scripts in one process.
+    Scripts are parsed concurrently, then all of their steps share a single
+    worker pool of size jobs (default: CPU count). jobs is a global limit:
+    batch, sync and parallel foreach steps run their inner work on the same
+    worker slots. Output is prefixed with the script path. Returns a dict
+    mapping each script path to its results.
+    """
+    jobs = jobs or os.cpu_count() or 1
+    width = max(len(path) for path in script_paths)
+    labels = {path: f"{Colors.DIM}[{path.ljust(width)}]{Colors.ENDC} " for path in script_paths}
+    history = open_history(history_path) if explain or not dry_run else None
+    slots = threading.BoundedSemaphore(jobs)
+    outcomes = {}
+    def load(path):
+        _output_label.set(labels[path])
+        try:
+            return load_ship(path)
+        except SyntaxError as e:
+            error = f"Syntax Error: {e}"
+        except Exception as e:
+            error = f"Error: {e}"
+        print(f"{Colors.FAIL}{error}{Colors.ENDC}")
+        outcomes[path] = ([{"stdout": "", "stderr": error, "returncode": 1}], 0.0)
+        return None
+    def execute(path, parser, pool):
+        _output_label.set(labels[path])
+        _worker_slots.set(slots)
+        start = time.time()
+        try:
+            results = parser.execute(dry_run=dry_run, jobs=jobs, history=history, explain=explain,
+                                     regression_threshold=regression_threshold, optimize=optimize, pool=pool)
+        except Exception as e:
+            print(f"{Colors.FAIL}Error: {e}{Colors.ENDC}")
+            results = [{"stdout": "", "stderr": str(e), "returncode": -1}]
+        outcomes[path] = (results, time.time() - start)
+    total_start = time.time()
+    output = PrefixedOutput(sys.stdout)
+    sys.stdout = output
+    try:
+        with ThreadPoolExecutor(max_workers=min(len(script_paths), 32)) as loaders:
+            parsers = dict(zip(script_paths, loaders.map(load, script_paths)))
+        with ThreadPoolExecutor(max_workers=jobs) as pool, ThreadPoolExecutor(max_workers=len(script_paths)) as drivers:
+            for future in [drivers.submit(execute, path, parser, pool) for path, parser in parsers.items() if parser]:
+                future.result()
+    finally:
+        output.drain()
+        sys.stdout = output.stream
+        if history:
+            history.close()
+    print_header("Summary")
+    failed = 0
+    for path in script_paths:
+        results, elapsed = outcomes[path]
+        errors = [r for r in results if r.get("returncode", 0) != 0]
+        ok_count = len(results) - len(errors)
+        if errors:
+            failed += 1
+            reason = (errors[0]["stderr"] or errors[0]["stdout"]).splitlines()
+            detail = f"{Colors.FAIL}{reason[0] if reason else 'failed'}{Colors.ENDC}"
+            print(f"{Symbols.CROSS} {path.ljust(width)} {Colors.DIM}({ok_count} steps, {elapsed:.2f}s){Colors.ENDC} {detail}")
+        else:
+            print(f"{Symbols.CHECK} {path.ljust(width)} {Colors.DIM}({ok_count} steps, {elapsed:.2f}s){Colors.ENDC}")
+    print(f"\n{Colors.DIM}{'-' * 60}{Colors.ENDC}")
+    if failed:
+        print(f"{Colors.FAIL}{Colors.BOLD}{failed} OF {len(script_paths)} SCRIPTS FAILED{Colors.ENDC}")
+    else:
+        print(f"{Colors.GREEN}{Colors.BOLD}ALL {len(script_paths)} SCRIPTS SUCCESSFUL{Colors.ENDC}")
+    print(f"Total Time: {time.time() - total_start:.2f}s | Jobs: {jobs}")
+    print(f"{Colors.DIM}{'-' * 60}{Colors.ENDC}\n")
+    return {path: outcomes[path][0] for path in script_paths}
+def _collect_scripts(paths, pattern):
+    """Expand files and directories into an ordered, de-duplicated list of scripts."""
+    scripts = []
+    for path in paths:
+        if os.path.isdir(path):
+            matches = sorted(glob.glob(os.path.join(path, pattern), recursive=True))
+            scripts.extend(match for match in matches if os.path.isfile(match))
+        elif os.path.exists(path):
+            if not path.endswith('.ship'):
+                print(f"{Colors.WARNING}Warning: File does not have .ship extension: {path}{Colors.ENDC}")
+            scripts.append(path)
+        else:
+            print(f"{Colors.FAIL}Error: Script not found: {path}{Colors.ENDC}")
+            sys.exit(1)
+    return list(dict.fromkeys(scripts))
 def main():
     """CLI entry point for Ship build system."""
     import argparse
@@ -759,22 +1751,83 @@ def main():
         epilog='Example: python ship_it.py build.ship --dry-run'
     )
     cli_parser.add_argument(
-        'script',
-        help='Path to the .ship build script'
+        'scripts',
+        nargs='+',
+        metavar='script',
+        help='Path to a .ship build script, or a directory to search for scripts'
+    )
+    cli_parser.add_argument(
+        '--glob',
+        default='**/*.ship',
+        help='Pattern used to find scripts inside directories (default: **/*.ship)'
     )
     cli_parser.add_argument(
         '--dry-run',
         action='store_true',
         help='Show what would be executed without running anything'
     )
+    cli_parser.add_argument(
+        '-j', '--jobs',
+        type=int,
+        default=None,
+        help='Run up to N independent steps concurrently, across all scripts; a global limit '
+             'that also covers the work inside batch, sync and parallel foreach steps '
+             '(default: CPU count for several scripts; a single script runs steps in order)'
+    )
+    cli_parser.add_argument(
+        '--explain',
+        action='store_true',
+        help='Show the plan with predicted durations and its critical path, then exit'
+    )
+    cli_parser.add_argument(
+        '--history',
+        default=HISTORY_FILE,
+        help=f'SQLite file used to record build history (default: {HISTORY_FILE})'
+    )
+    cli_parser.add_argument(
+        '--no-history',
+        action='store_true',
+        help='Do not read or record build history'
+    )
+    cli_parser.add_argument(
+        '--regression-threshold',
+        type=float,
+        default=0.5,
+        help='Warn when a step is slower than its rolling median by this fraction (default: 0.5)'
+    )
+    cli_parser.add_argument(
+        '--no-optimize',
+        action='store_true',
+        help='Run every step as written instead of fusing adjacent file operations'
+    )
     args = cli_parser.parse_args()
-    if not os.path.exists(args.script):
-        print(f"{Colors.FAIL}Error: Script not found: {args.script}{Colors.ENDC}")
+    scripts = _collect_scripts(args.scripts, args.glob)
+    if not scripts:
+        print(f"{Colors.FAIL}Error: No scripts matching {args.glob} found{Colors.ENDC}")
         sys.exit(1)
-    if not args.script.endswith('.ship'):
-        print(f"{Colors.WARNING}Warning: File does not have .ship extension{Colors.ENDC}")
     try:
-        results = run_ship(args.script, dry_run=args.dry_run)
+        if len(scripts) > 1:
+            outcomes = run_ships(
+                scripts,
+                dry_run=args.dry_run,
+                jobs=max(1, args.jobs) if args.jobs else None,
+                explain=args.explain,
+                history_path=None if args.no_history else args.history,
+                regression_threshold=args.regression_threshold,
+                optimize=not args.no_optimize
+            )
+            if any(r.get('returncode', 0) != 0 for results in outcomes.values() for r in results):
+                sys.exit(1)
+            return
+        results = run_ship(
+            scripts[0],
+            dry_run=args.dry_run,
+            jobs=max(1, args.jobs) if args.jobs else None,
+            explain=args.explain,
+            history_path=None if args.no_history else args.history,
+            regression_threshold=args.regression_threshold,
+            optimize=not args.no_optimize
+        )
         if any(r.get('returncode', 0) != 0 for r in results):
             sys.exit(1)
     except SyntaxError as e: